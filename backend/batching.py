@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import os
+from concurrent.futures import Executor
+from typing import Dict, List, Optional, Tuple, Union
+
+import torch
+
+from model_inference import ImagePredictor, MAX_BATCH
+
+logger = logging.getLogger(__name__)
+
+# --------------------------
+# Configuration
+# --------------------------
+# MAX_BATCH, the largest number of images run through the model in one forward pass, comes from
+# model_inference, which builds the TensorRT profile and CUDA graphs for batch sizes up to it
+# How long the first request in a batch waits for others to join it
+MAX_WAIT_MS = float(os.getenv("MAX_WAIT_MS", "10"))
+
+class MicroBatcher:
+    """
+    Coalesces concurrent /predict requests into a single forward pass.
+    Requests submit a preprocessed tensor and await its result; a background task
+    collects up to `max_batch` tensors, or whatever arrived within `max_wait_ms`
+    of the first one, and runs them through the predictor together.
+    """
+    def __init__(self,
+                 predictor: ImagePredictor,
+                 max_batch: int = MAX_BATCH,
+                 max_wait_ms: float = MAX_WAIT_MS,
+                 executor: Optional[Executor] = None):
+        self.predictor = predictor
+        # Where the blocking forward pass runs; None uses the event loop's default executor
+        self.executor = executor
+        if max_batch > MAX_BATCH:
+            logger.warning(f"max_batch {max_batch} exceeds MAX_BATCH ({MAX_BATCH}), which the GPU "
+                           f"engines and graphs are built for; using {MAX_BATCH}")
+        self.max_batch = max(1, min(max_batch, MAX_BATCH))
+        self.max_wait = max_wait_ms / 1000
+        self.queue: "asyncio.Queue[Tuple[torch.Tensor, asyncio.Future]]" = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Starts the background batching task on the running event loop."""
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Micro-batching enabled (max batch {self.max_batch}, max wait {self.max_wait * 1000:.0f} ms)")
+
+    async def stop(self):
+        """Cancels the background batching task."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def submit(self, tensor: torch.Tensor) -> Dict[str, Union[str, int, float]]:
+        """Queues one preprocessed tensor and waits for its result dictionary."""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((tensor, future))
+        return await future
+
+    async def _collect(self) -> List[Tuple[torch.Tensor, asyncio.Future]]:
+        """Waits for a first request, then gathers more until the batch is full or the window closes."""
+        loop = asyncio.get_running_loop()
+        items = [await self.queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(items) < self.max_batch:
+            # Requests that queued up during the previous forward pass join without waiting
+            try:
+                items.append(self.queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                items.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return items
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = await self._collect()
+            tensors = [tensor for tensor, _ in items]
+            logger.debug(f"Running batch of {len(tensors)}")
+            try:
+                # The forward pass blocks, so keep it off the event loop
+                results = await loop.run_in_executor(self.executor, self.predictor.predict_batch, tensors)
+            except Exception as e:
+                logger.error(f"Batch inference failed: {e}", exc_info=True)
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), result in zip(items, results):
+                # The request may have been cancelled while its batch was running
+                if not future.done():
+                    future.set_result(result)
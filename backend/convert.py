@@ -0,0 +1,531 @@
+#!/usr/bin/env python3
+"""
+Convert the effv2s_fold5 SavedModule directory into a standard checkpoint file.
+
+The storage format is: ('storage', <storage_class>, storage_index_str, device_str, size)
+Each loading strategy is a SavedModuleLoader variant, picked with --variant:
+  v1     torch.load on data.pkl, falling back to a CUDA load and a bare unpickler
+  v2     storage files are mapped one at a time as persistent_load asks for them
+  v3     all storages copied into one arena; unknown storage types are an error
+  final  all storages copied into one arena; unknown storage types default to float32
+"""
+import torch
+import torch.nn as nn
+import torch._utils
+from safetensors import safe_open
+from safetensors.torch import save_file
+from torchvision.models import efficientnet_v2_s
+from pathlib import Path
+from typing import Literal, Optional
+from abc import ABC, abstractmethod
+import pickle
+import argparse
+import copy
+import itertools
+import functools
+import gc
+import mmap
+import os
+import warnings
+import zipfile
+import logging
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import multiprocessing as mp
+
+log = logging.getLogger(__name__)
+
+# Model configuration
+CLASS2IDX = {"Fake": 0, "Real": 1}
+
+SAVEDMODULE_DIR = Path("effv2s_fold5")
+
+# Legacy storage classes are hashable, so resolve their dtype with a single lookup
+DTYPE_MAP = {
+    torch.FloatStorage: torch.float32,
+    torch.DoubleStorage: torch.float64,
+    torch.HalfStorage: torch.float16,
+    torch.IntStorage: torch.int32,
+    torch.LongStorage: torch.int64,
+    torch.ShortStorage: torch.int16,
+    torch.ByteStorage: torch.uint8,
+    torch.CharStorage: torch.int8,
+    torch.BoolStorage: torch.bool,
+}
+
+# Byte alignment of each storage slot in the shared arena
+POOL_ALIGNMENT = 64
+
+# Input size and largest tolerated logit change for the --bf16 comparison
+CHECK_IMG_SIZE = 384
+BF16_MAX_LOGIT_DIFF = 1e-2
+
+Variant = Literal["v1", "v2", "v3", "final"]
+
+# --------------------------
+# Model Definition
+# --------------------------
+def create_model(num_classes: int = 2) -> nn.Module:
+    """Creates an EfficientNet-V2 Small model with a custom classifier head."""
+    model = efficientnet_v2_s()
+    in_features = model.classifier[-1].in_features
+    model.classifier[-1] = nn.Linear(in_features, num_classes)
+    return model
+
+def fast_load(model: nn.Module, state_dict) -> None:
+    """Swap checkpoint tensors into the model by key, like load_state_dict(assign=True)
+    but without its per-parameter matching and shape checks. The key sets are compared
+    once at the end instead."""
+    for key, value in state_dict.items():
+        module_path, _, name = key.rpartition('.')
+        try:
+            module = model.get_submodule(module_path)
+        except AttributeError:
+            raise RuntimeError(f"Unexpected key in state dict: {key}")
+        if isinstance(getattr(module, name, None), nn.Parameter):
+            setattr(module, name, nn.Parameter(value))
+        else:
+            setattr(module, name, value)
+
+    mismatched = set(model.state_dict()) ^ set(state_dict)
+    if mismatched:
+        raise RuntimeError(f"State dict keys do not match the model: {sorted(mismatched)[:10]}")
+
+# --------------------------
+# Storage Loading
+# --------------------------
+def map_storage_file(entry):
+    """Map one (index, path) storage entry read-only and start the kernel reading it in."""
+    idx, path = entry
+    try:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            # Queue kernel readahead for the whole file before touching it (Linux only)
+            if hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            mm = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+        finally:
+            os.close(fd)
+    except (ValueError, OSError):
+        return idx, None
+    if hasattr(mmap, 'MADV_WILLNEED'):
+        mm.madvise(mmap.MADV_WILLNEED)
+    return idx, mm
+
+class SavedModuleLoader(ABC):
+    """
+    Reads a SavedModule directory (data.pkl plus one file per storage under data/)
+    back into the checkpoint object. Subclasses implement load() and the name-based
+    dtype fallback for storage classes missing from DTYPE_MAP; an incomplete subclass
+    fails when it is instantiated.
+    """
+    def __init__(self, savedmodule_dir: Path):
+        self.savedmodule_dir = savedmodule_dir
+        self.data_pkl = savedmodule_dir / "data.pkl"
+        self.data_dir = savedmodule_dir / "data"
+
+    @abstractmethod
+    def load(self):
+        """Returns the unpickled checkpoint, or None if no method could read it."""
+
+    @staticmethod
+    @abstractmethod
+    def dtype_from_class_name(storage_class) -> Optional[torch.dtype]:
+        """Fallback for storage classes missing from DTYPE_MAP: match on the class name."""
+
+    def dtype_for(self, storage_class) -> Optional[torch.dtype]:
+        dtype = DTYPE_MAP.get(storage_class)
+        if dtype is None:
+            dtype = self.dtype_from_class_name(storage_class)
+        return dtype
+
+    @staticmethod
+    def parse_saved_id(saved_id):
+        """Split a persistent id into its storage class and integer storage index."""
+        # saved_id format: ('storage', <torch.StorageClass>, storage_index_str, device_str, size)
+        # Example: ('storage', <class 'torch.FloatStorage'>, '0', 'cuda:0', 648)
+        if not isinstance(saved_id, tuple) or len(saved_id) < 4:
+            raise RuntimeError(f"Unexpected persistent id: {saved_id}")
+
+        tag = saved_id[0]  # 'storage'
+        storage_class = saved_id[1]  # torch.FloatStorage, torch.IntStorage, etc. (the class itself!)
+        storage_id_str = saved_id[2]  # storage index as STRING
+
+        if tag != 'storage':
+            raise RuntimeError(f"Unknown persistent id tag: {tag}")
+
+        # Convert storage index from string to int
+        try:
+            storage_id = int(storage_id_str)
+        except (ValueError, TypeError):
+            raise RuntimeError(f"Cannot convert storage_id to int: {storage_id_str} (from saved_id: {saved_id})")
+        return storage_class, storage_id
+
+    def _unpickle(self, persistent_load):
+        with open(self.data_pkl, 'rb') as f:
+            unpickler = pickle.Unpickler(f)
+            unpickler.persistent_load = persistent_load
+            return unpickler.load()
+
+class TorchLoadLoader(SavedModuleLoader):
+    """v1: let torch.load read data.pkl, falling back to a CUDA load and a bare unpickler."""
+
+    @staticmethod
+    def dtype_from_class_name(storage_class) -> Optional[torch.dtype]:
+        # torch.load rebuilds the storages itself, so no dtype is ever looked up
+        return None
+
+    def load(self):
+        # Try 1: Direct load with CPU mapping; mmap=True maps tensor data from the
+        # file instead of reading it onto the heap
+        try:
+            print("Method 1: Direct torch.load with CPU mapping (mmap, weights only)...")
+            state_dict = torch.load(str(self.data_pkl), map_location="cpu", mmap=True, weights_only=True)
+            print("✓ Successfully loaded!")
+            return state_dict
+        except Exception as e1:
+            log.exception("✗ Method 1 failed: %s", e1)
+
+        # Try 2: Load on CUDA then move to CPU
+        try:
+            print("Method 2: Load on CUDA then move to CPU...")
+            if not torch.cuda.is_available():
+                raise RuntimeError("CUDA not available")
+            state_dict = torch.load(str(self.data_pkl), map_location="cuda", weights_only=False)
+            # Move all tensors to CPU
+            for key in state_dict:
+                if isinstance(state_dict[key], torch.Tensor):
+                    state_dict[key] = state_dict[key].cpu()
+            print("✓ Loaded on CUDA and moved to CPU")
+            return state_dict
+        except Exception as e2:
+            log.exception("✗ Method 2 failed: %s", e2)
+
+        # Try 3: Custom pickle unpickler with tensor rebuilder
+        try:
+            print("Method 3: Custom pickle unpickler with persistent_load handler...")
+
+            # Save original rebuild function
+            original_rebuild = torch._utils._rebuild_tensor_v2
+
+            def rebuild_tensor_cpu(*args, **kwargs):
+                """Custom tensor builder that creates CPU tensors."""
+                result = original_rebuild(*args, **kwargs)
+                if isinstance(result, torch.Tensor) and result.is_cuda:
+                    result = result.cpu()
+                return result
+
+            def persistent_load(saved_id):
+                """Handle PyTorch's persistent ID references."""
+                return saved_id
+
+            # Temporarily replace the rebuild function
+            torch._utils._rebuild_tensor_v2 = rebuild_tensor_cpu
+            try:
+                state_dict = self._unpickle(persistent_load)
+            finally:
+                # Restore original function
+                torch._utils._rebuild_tensor_v2 = original_rebuild
+            print("✓ Loaded with custom persistent_load handler")
+            return state_dict
+        except Exception as e3:
+            log.exception("✗ Method 3 failed: %s", e3)
+            return None
+
+class LazyStorageLoader(SavedModuleLoader):
+    """v2: map each storage file only when persistent_load asks for it."""
+
+    @staticmethod
+    @functools.lru_cache(maxsize=16)
+    def dtype_from_class_name(storage_class) -> Optional[torch.dtype]:
+        storage_type = str(storage_class)
+        if 'Float' in storage_type:
+            return torch.float32
+        elif 'Int' in storage_type or 'Long' in storage_type:
+            return torch.int64
+        print(f"Unknown storage type: {storage_type}")
+        return None
+
+    def load(self):
+        # Create a mapping of storage indices to their file paths
+        with os.scandir(self.data_dir) as it:
+            storage_files = {int(e.name): e.path for e in it if e.name.isdigit()}
+        print(f"  - Found {len(storage_files)} storage files")
+
+        def persistent_load(saved_id):
+            """Load tensor storage from its file."""
+            storage_class, storage_id = self.parse_saved_id(saved_id)
+            if storage_id not in storage_files:
+                raise RuntimeError(f"Storage {storage_id} not found in {self.data_dir}")
+            dtype = self.dtype_for(storage_class)
+            if dtype is None:
+                raise RuntimeError(f"Unknown storage type: {storage_class}")
+
+            _, mm = map_storage_file((storage_id, storage_files[storage_id]))
+            if mm is None:
+                raise RuntimeError(f"Cannot map storage file {storage_files[storage_id]}")
+            # Copy the raw bytes straight out of the mapping into a storage
+            with mm:
+                untyped = torch.UntypedStorage.from_buffer(mm, dtype=torch.uint8)
+            return torch.storage.TypedStorage(wrap_storage=untyped, dtype=dtype, _internal=True)
+
+        print("\nLoading pickle metadata with custom storage loader...")
+        return self._unpickle(persistent_load)
+
+class ArenaLoader(SavedModuleLoader):
+    """final: map every storage file up front and copy them all into one arena."""
+
+    @staticmethod
+    @functools.lru_cache(maxsize=16)
+    def dtype_from_class_name(storage_class) -> Optional[torch.dtype]:
+        storage_class_str = str(storage_class)
+
+        if 'FloatStorage' in storage_class_str:
+            return torch.float32
+        elif 'DoubleStorage' in storage_class_str:
+            return torch.float64
+        elif 'HalfStorage' in storage_class_str:
+            return torch.float16
+        elif 'IntStorage' in storage_class_str:
+            return torch.int32
+        elif 'LongStorage' in storage_class_str:
+            return torch.int64
+        elif 'ShortStorage' in storage_class_str:
+            return torch.int16
+        elif 'ByteStorage' in storage_class_str or 'CharStorage' in storage_class_str:
+            return torch.uint8
+        elif 'BoolStorage' in storage_class_str:
+            return torch.bool
+        else:
+            # Default to float32
+            print(f"Warning: Unknown storage class {storage_class_str}, defaulting to float32")
+            return torch.float32
+
+    def load(self):
+        # Map storage files read-only; the I/O is issued from a thread pool so the
+        # reads overlap instead of running one file at a time
+        print(f"Mapping storage files...")
+        with os.scandir(self.data_dir) as it:
+            entries = [(int(e.name), e.path) for e in it if e.name.isdigit()]
+        entries.sort()
+
+        # Storage indices are small and contiguous, so index a list instead of hashing into a dict
+        num_slots = entries[-1][0] + 1 if entries else 0
+        storage_data = [None] * num_slots
+        with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as executor:
+            for idx, mm in executor.map(map_storage_file, entries):
+                if mm is not None:
+                    storage_data[idx] = mm
+
+        print(f"Mapped {sum(mm is not None for mm in storage_data)} storage files")
+
+        # Lay every storage out in one preallocated arena; persistent_load copies each
+        # file into its slot and hands back a storage view, so there is a single
+        # allocation instead of one per tensor
+        storage_offsets = [0] * num_slots
+        pool_nbytes = 0
+        for idx, mm in enumerate(storage_data):
+            if mm is None:
+                continue
+            storage_offsets[idx] = pool_nbytes
+            pool_nbytes += -(-len(mm) // POOL_ALIGNMENT) * POOL_ALIGNMENT
+        pool = torch.empty(pool_nbytes, dtype=torch.uint8)
+        pool_storage = pool.untyped_storage()
+
+        def persistent_load(saved_id):
+            """Reconstruct storage from saved_id and storage_data."""
+            storage_class, storage_id = self.parse_saved_id(saved_id)
+            raw_bytes = storage_data[storage_id] if 0 <= storage_id < num_slots else None
+            if raw_bytes is None:
+                raise RuntimeError(f"Storage {storage_id} not found in storage_data ({num_slots} slots)")
+            dtype = self.dtype_for(storage_class)
+
+            # Copy the raw bytes into this storage's arena slot and return a view of it
+            offset = storage_offsets[storage_id]
+            nbytes = len(raw_bytes)
+            pool[offset:offset + nbytes].copy_(torch.frombuffer(raw_bytes, dtype=torch.uint8))
+            untyped = pool_storage[offset:offset + nbytes]
+            return torch.storage.TypedStorage(wrap_storage=untyped, dtype=dtype, _internal=True)
+
+        try:
+            print("\nLoading metadata with custom persistent_load...")
+            with warnings.catch_warnings():
+                # The mappings are read-only; they are only ever copied from
+                warnings.filterwarnings("ignore", message="The given buffer is not writable")
+                return self._unpickle(persistent_load)
+        finally:
+            # Every storage has been copied out of its mapping by now
+            for mm in storage_data:
+                if mm is not None:
+                    mm.close()
+
+class StrictArenaLoader(ArenaLoader):
+    """v3: the arena loader, but a storage type it cannot name is an error."""
+
+    @staticmethod
+    @functools.lru_cache(maxsize=16)
+    def dtype_from_class_name(storage_class) -> Optional[torch.dtype]:
+        storage_type = str(storage_class)
+
+        if 'Float' in storage_type:
+            return torch.float32
+        elif 'Double' in storage_type:
+            return torch.float64
+        elif 'Half' in storage_type:
+            return torch.float16
+        elif 'Int' in storage_type:
+            return torch.int32
+        elif 'Long' in storage_type:
+            return torch.int64
+        elif 'Short' in storage_type:
+            return torch.int16
+        elif 'Byte' in storage_type:
+            return torch.uint8
+        elif 'Char' in storage_type:
+            return torch.int8
+        elif 'Bool' in storage_type:
+            return torch.bool
+        else:
+            raise RuntimeError(f"Unknown storage type: {storage_type}")
+
+LOADERS = {
+    "v1": TorchLoadLoader,
+    "v2": LazyStorageLoader,
+    "v3": StrictArenaLoader,
+    "final": ArenaLoader,
+}
+
+# --------------------------
+# Conversion
+# --------------------------
+@torch.inference_mode()
+def bf16_logit_diff(model: nn.Module, model_state: dict) -> float:
+    """Largest logit change on a fixed input when model's weights are replaced by model_state,
+    upcast back to FP32 the way the server loads them."""
+    torch.manual_seed(0)
+    x = torch.rand(2, 3, CHECK_IMG_SIZE, CHECK_IMG_SIZE)
+    rounded = copy.deepcopy(model)
+    rounded.load_state_dict(model_state)
+    return (rounded(x) - model(x)).abs().max().item()
+
+def _convert_worker(variant: Variant = "final", legacy: bool = False, bf16: bool = False):
+    """Convert the SavedModule to a checkpoint file.
+    Runs in the child process started by convert()."""
+    # A spawned child starts with unconfigured logging
+    logging.basicConfig(format="%(message)s")
+
+    output_file = Path("effv2s_fold5.pt" if legacy else "effv2s_fold5.safetensors")
+    loader = LOADERS[variant](SAVEDMODULE_DIR)
+
+    if not loader.data_pkl.exists():
+        print(f"ERROR: {loader.data_pkl} not found!")
+        return False
+
+    print(f"Loading SavedModule from {SAVEDMODULE_DIR} with the {variant} loader...")
+    try:
+        state_dict = loader.load()
+    except Exception as e:
+        log.exception("✗ Failed to load with the %s loader: %s", variant, e)
+        return False
+
+    if state_dict is None:
+        print("ERROR: Could not load state dict!")
+        return False
+
+    print(f"✓ Loaded state dict: {type(state_dict)}")
+
+    # Process state_dict
+    if isinstance(state_dict, dict):
+        keys = list(state_dict.keys())
+        print(f"  - Dictionary has {len(keys)} top-level keys")
+        if "model" in state_dict:
+            print("  - Found 'model' wrapper, extracting...")
+            state_dict = state_dict["model"]
+            print(f"  - Extracted {len(state_dict)} model parameters")
+
+    # Create and load model
+    print("\n✓ Creating fresh EfficientNetV2-S model...")
+    # Build on the meta device so no parameter memory is allocated; the checkpoint
+    # tensors are then assigned in by reference instead of copied
+    with torch.device("meta"):
+        model = create_model(len(CLASS2IDX))
+
+    print("  - Loading state dict into model...")
+    try:
+        fast_load(model, state_dict)
+        print("  ✓ State dict loaded successfully!")
+    except RuntimeError as e:
+        print(f"  ✗ State dict mismatch: {e}")
+        print("    This means the model architecture doesn't match the saved weights.")
+        return False
+
+    leftover = [name for name, t in itertools.chain(model.named_parameters(), model.named_buffers()) if t.is_meta]
+    if leftover:
+        print(f"  ✗ Not initialized by the checkpoint: {leftover}")
+        return False
+
+    # The model now owns the weights; drop the checkpoint containers before saving
+    del state_dict
+    gc.collect()
+
+    # Save as .safetensors, or as a standard .pt file with --legacy
+    model = model.cpu().eval()
+    print(f"\n✓ Saving to {output_file}...")
+    model_state = model.state_dict()
+    if bf16:
+        # BF16 halves the file and its load bandwidth; load_state_dict copies the weights back
+        # into FP32 parameters on the serving side. Buffers (BatchNorm running statistics) stay
+        # FP32, since Conv+BN fusion turns rsqrt(var + eps) into conv weights
+        params = {name for name, _ in model.named_parameters()}
+        model_state = {k: v.bfloat16() if k in params and v.dtype == torch.float32 else v
+                       for k, v in model_state.items()}
+        max_diff = bf16_logit_diff(model, model_state)
+        if max_diff > BF16_MAX_LOGIT_DIFF:
+            print(f"  ✗ BF16 weights change the logits by up to {max_diff:.2e}; convert without --bf16")
+            return False
+        print(f"  ✓ BF16 weights change the logits by up to {max_diff:.2e}")
+    if legacy:
+        torch.save({"model": model_state}, output_file, pickle_protocol=5, _use_new_zipfile_serialization=True)
+    else:
+        save_file(model_state, str(output_file))
+    print("  ✓ Saved successfully!")
+
+    # Verify from the file header instead of loading the checkpoint back
+    print("\n✓ Verifying saved file...")
+    expected_min = sum(t.numel() * t.element_size() for t in model_state.values())
+    if legacy:
+        with zipfile.ZipFile(output_file) as z:
+            header_ok = any(name.endswith("/data.pkl") for name in z.namelist())
+    else:
+        with safe_open(str(output_file), framework="pt") as f:
+            header_ok = len(f.keys()) == len(model_state)
+    if not header_ok or output_file.stat().st_size < expected_min:
+        print(f"  ✗ Verification failed: {output_file} has an incomplete header or is truncated")
+        return False
+    print(f"  ✓ Verification OK: Contains {len(model_state)} parameters")
+
+    print("\n" + "="*60)
+    print("SUCCESS: Model converted to " + str(output_file))
+    print("="*60)
+    return True
+
+def convert(variant: Variant = "final", legacy: bool = False, bf16: bool = False):
+    """Convert the SavedModule to a checkpoint file with the given loader variant.
+    The work runs in a spawned child process: CPython keeps freed arenas after a large
+    load, so exiting the child is what actually returns that memory to the OS.
+    Writes .safetensors unless legacy=True, which keeps the old torch.save .pt output.
+    Weights are stored as FP32 unless bf16=True, which stores the parameters (not the
+    BatchNorm statistics) as BF16 after checking the logits still match."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context("spawn")) as executor:
+        return executor.submit(_convert_worker, variant, legacy, bf16).result()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert the effv2s_fold5 SavedModule into a checkpoint file.")
+    parser.add_argument("--variant", choices=sorted(LOADERS), default="final",
+                        help="how to read the SavedModule storages (default: final)")
+    parser.add_argument("--legacy", action="store_true",
+                        help="write a torch.save .pt checkpoint instead of .safetensors")
+    parser.add_argument("--bf16", action="store_true",
+                        help="store the weights as BF16 (half the size) after checking the logits barely change")
+    args = parser.parse_args()
+    success = convert(variant=args.variant, legacy=args.legacy, bf16=args.bf16)
+    exit(0 if success else 1)
@@ -2,30 +2,64 @@ from fastapi import FastAPI, File, UploadFile, HTTPException
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import uvicorn
 import os
 import logging
+import logging.handlers
+import queue
+import atexit
 from dotenv import load_dotenv
-from model_inference import initialize_predictor, ImagePredictor
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Configure logging
+# OpenMP/MKL read their thread settings when torch is first imported, so set them before
+# model_inference pulls it in. OMP_WAIT_POLICY is left to the environment: ACTIVE keeps
+# every inference thread's OpenMP team spinning at 100% CPU even while the server is idle.
+_num_threads = os.getenv("TORCH_NUM_THREADS", "4")
+os.environ.setdefault("OMP_NUM_THREADS", _num_threads)
+os.environ.setdefault("MKL_NUM_THREADS", _num_threads)
+
+from model_inference import initialize_predictor, ImagePredictor
+from batching import MicroBatcher
+
+# Configure logging. Records go through a queue to a listener thread that does the
+# actual stream writes, so logging calls on request and startup paths never block on I/O.
 log_level = os.getenv("LOG_LEVEL", "INFO")
+_log_queue = queue.Queue(-1)
+_stream_handler = logging.StreamHandler()
+_stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+log_listener = logging.handlers.QueueListener(_log_queue, _stream_handler)
 logging.basicConfig(
     level=getattr(logging, log_level),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    handlers=[logging.handlers.QueueHandler(_log_queue)]
 )
+log_listener.start()
+# Flush whatever is still queued when the process exits
+atexit.register(log_listener.stop)
 logger = logging.getLogger(__name__)
 
 # --- Configuration ---
 # Allow overriding the model path via environment variable
-MODEL_PATH = os.getenv("MODEL_PATH", "effv2s_fold5.pt")
+MODEL_PATH = os.getenv("MODEL_PATH", "")
+if not MODEL_PATH:
+    MODEL_PATH = "effv2s_fold5.safetensors"
+    # Deployments that predate convert.py's safetensors output only have the .pt checkpoint
+    if not os.path.exists(MODEL_PATH) and os.path.exists("effv2s_fold5.pt"):
+        logger.warning(f"{MODEL_PATH} not found; loading the legacy effv2s_fold5.pt "
+                       "(run convert.py to write the safetensors file)")
+        MODEL_PATH = "effv2s_fold5.pt"
 API_HOST = os.getenv("API_HOST", "0.0.0.0")
 API_PORT = int(os.getenv("API_PORT", "8000"))
+# Server processes when run as a script; each loads its own copy of the model
+WORKERS = int(os.getenv("WORKERS", "1"))
 MAX_FILE_SIZE = int(os.getenv("MAX_FILE_SIZE", 10 * 1024 * 1024))  # 10MB default
+READ_CHUNK_SIZE = 1024 * 1024  # Upload read granularity for the size check
 REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", 30))
+# Threads for preprocessing and inference, kept off the event loop
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "2"))
 
 logger.info(f"Configuration loaded - Model: {MODEL_PATH}, Host: {API_HOST}:{API_PORT}")
 
@@ -38,12 +72,21 @@ async def lifespan(app: FastAPI):
     """
     logger.info("Application startup: Initializing model predictor...")
     try:
-        # Initialize the global predictor instance only if the model file exists
+        # Initialize the shared predictor instance only if the model file exists
         if os.path.exists(MODEL_PATH):
             app.state.predictor = initialize_predictor(MODEL_PATH)
             logger.info("Model predictor initialized successfully.")
+            # Warm up in the background so startup returns right away; the first requests
+            # wait for it instead of paying for kernel selection and cold caches themselves
+            app.state.predictor.start_warmup()
+            app.state.executor = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="inference")
+            # Coalesce concurrent requests into shared forward passes
+            app.state.batcher = MicroBatcher(app.state.predictor, executor=app.state.executor)
+            app.state.batcher.start()
         else:
             app.state.predictor = None
+            app.state.executor = None
+            app.state.batcher = None
             logger.warning(f"Model file not found at {MODEL_PATH}. Starting API without the model.\n"
                           "Predict endpoint will return 503 until a valid model is provided.")
     except Exception as e:
@@ -53,6 +96,12 @@ async def lifespan(app: FastAPI):
     yield  # Application is running
     
     logger.info("Application shutdown: Cleaning up...")
+    if app.state.batcher is not None:
+        await app.state.batcher.stop()
+    app.state.batcher = None
+    if app.state.executor is not None:
+        app.state.executor.shutdown(wait=True)
+    app.state.executor = None
     app.state.predictor = None
 
 # --- FastAPI App Initialization ---
@@ -111,41 +160,60 @@ async def predict_image(file: UploadFile = File(...)):
         logger.error("Model predictor not loaded")
         raise HTTPException(status_code=503, detail="Model is not loaded or initialized.")
 
-    # 3. Read the image file content
+    # 3. Read the image file content in chunks, rejecting it as soon as it exceeds
+    #    the size limit (e.g., max 10MB) instead of buffering all of it first
+    too_large = HTTPException(
+        status_code=413,
+        detail=f"File size exceeds maximum allowed ({MAX_FILE_SIZE / (1024*1024):.1f} MB)"
+    )
+    if file.size is not None and file.size > MAX_FILE_SIZE:
+        logger.warning(f"File too large: {file.size} bytes")
+        raise too_large
     try:
-        image_bytes = await file.read()
+        image_bytes = bytearray()
+        while chunk := await file.read(READ_CHUNK_SIZE):
+            image_bytes += chunk
+            if len(image_bytes) > MAX_FILE_SIZE:
+                logger.warning(f"File too large: over {MAX_FILE_SIZE} bytes")
+                raise too_large
         logger.info(f"Image received: {file.filename}, size: {len(image_bytes)} bytes")
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error reading image file: {e}")
         raise HTTPException(status_code=400, detail=f"Could not read image file: {e}")
 
-    # 4. Validate file size (e.g., max 10MB)
-    if len(image_bytes) > MAX_FILE_SIZE:
-        logger.warning(f"File too large: {len(image_bytes)} bytes")
-        raise HTTPException(
-            status_code=413,
-            detail=f"File size exceeds maximum allowed ({MAX_FILE_SIZE / (1024*1024):.1f} MB)"
-        )
-
-    # 5. Run inference
+    # 4. Preprocess, then run inference in a shared batch
     try:
-        result = predictor.predict(image_bytes)
-        logger.info(f"Inference successful for {file.filename}: {result['predicted_label']}")
+        # Decoding and resizing are CPU-bound, so overlap them with other requests' inference
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(app.state.executor, predictor.preprocess, image_bytes)
+        if not isinstance(result, dict):
+            result = await app.state.batcher.submit(result)
     except Exception as e:
         logger.error(f"Inference error: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error during inference: {e}")
 
-    # 6. Return the result
+    if "error" in result:
+        logger.warning(f"Inference failed for {file.filename}: {result['error_code']}")
+        # Unreadable images are the client's fault; anything else is ours
+        status_code = 400 if result["error_code"] in ("INVALID_IMAGE", "PREPROCESSING_ERROR") else 500
+        raise HTTPException(status_code=status_code, detail=result["error"])
+    logger.info(f"Inference successful for {file.filename}: {result['predicted_label']}")
+
+    # 5. Return the result
     return JSONResponse(content=result)
 
 # --- Uvicorn Server (for local testing) ---
 # This part is typically run via 'uvicorn main:app --host 0.0.0.0 --port 8000'
 # but we include it here for completeness if run as a script.
 if __name__ == "__main__":
-    logger.info(f"Starting SmartChecker API server on {API_HOST}:{API_PORT}")
+    logger.info(f"Starting SmartChecker API server on {API_HOST}:{API_PORT} with {WORKERS} worker(s)")
+    # Multiple workers need the app as an import string so each process can load it
     uvicorn.run(
-        app,
+        "main:app",
         host=API_HOST,
         port=API_PORT,
+        workers=WORKERS,
         log_level=log_level.lower()
     )